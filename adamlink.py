@@ -10,6 +10,7 @@ import rdflib
 from rdflib import Dataset, ConjunctiveGraph, Graph, URIRef, Literal, XSD, Namespace, RDFS, BNode, OWL
 
 from ontology import Dataset, DataDownload, Linkset, rdfSubject
+import rdfio
 
 create = Namespace("https://data.create.humanities.uva.nl/")
 schema = Namespace("http://schema.org/")
@@ -130,7 +131,7 @@ Maakt en publiceert u data met (historische) straat-, gebouw- of persoonsnamen?
         # Add data to the respective graph
         print("Parsing", uri)
         subgraph = rdflib.Graph(identifier=guri)
-        subgraph.parse(fp, format='turtle')
+        rdfio.parse(subgraph, fp, format='turtle')
 
         dsG.add_graph(subgraph)
         subdatasets.append(subds)
@@ -154,7 +155,7 @@ Maakt en publiceert u data met (historische) straat-, gebouw- of persoonsnamen?
     dsG.bind('schema', schema)
 
     print("Serializing!")
-    dsG.serialize('datasets/adamlink.trig', format='trig')
+    rdfio.serialize(dsG, 'datasets/adamlink.trig', format='trig')
 
 
 if __name__ == "__main__":
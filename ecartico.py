@@ -10,6 +10,7 @@ import rdflib
 from rdflib import Dataset, ConjunctiveGraph, Graph, URIRef, Literal, XSD, Namespace, RDFS, BNode, OWL
 
 from ontology import Dataset, DataDownload, Linkset, rdfSubject
+import rdfio
 
 create = Namespace("https://data.create.humanities.uva.nl/")
 schema = Namespace("http://schema.org/")
@@ -115,7 +116,7 @@ Current projects are:
     g.bind('skos', Namespace('http://www.w3.org/2004/02/skos/core#'))
     g.bind('time', Namespace('http://www.w3.org/2006/time#'))
 
-    g.parse(fp, format='nt')
+    rdfio.parse(g, fp, format='nt')
 
     dsG.add_graph(g)
 
@@ -126,7 +127,7 @@ Current projects are:
     dsG.bind('schema', schema)
 
     print("Serializing!")
-    dsG.serialize('datasets/ecartico.trig', format='trig')
+    rdfio.serialize(dsG, 'datasets/ecartico.trig', format='trig')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,459 @@
+"""
+Check the integrity of a linkset against the datasets it links.
+
+For every `void:target` of a linkset a compact membership index is built: the
+sorted array of 64-bit hashes of all subject IRIs in that dataset's dump
+(8 bytes per subject). The links are then streamed through these indices in
+batches, so memory stays bounded by the size of the target indices and one
+batch of links.
+
+Each end of a link is classified by matching it to a target on its IRI
+prefix:
+
+    * `ok`: the IRI is a subject in the target dataset
+    * `dangling`: the IRI has the right form, but is not in the target dataset
+    * `broken`: the IRI has the target's prefix, but not its pattern
+    * `unknown`: the IRI does not belong to any target
+    * `unchecked`: the target has no local dump (e.g. Wikidata)
+
+The ends of a batch are classified with vectorized prefix and pattern
+checks. Only the issues (`dangling`, `broken` and `unknown` ends) are written
+to the csv file, all states are counted.
+
+N-Triples and N-Quads files are read line by line, which is what makes
+multi-million link sets fast. Other formats (e.g. the TriG files in
+`datasets/`) are first converted to a temporary N-Quads file with
+`rdfio.convert()`, which streams if pyoxigraph is installed.
+"""
+
+import os
+import re
+import datetime
+import tempfile
+
+from collections import namedtuple, Counter
+from contextlib import contextmanager
+from typing import Iterable, Generator
+
+import numpy as np
+import pandas as pd
+
+import rdflib
+from rdflib import URIRef, Literal, XSD, Namespace, RDF, OWL
+from rdflib.util import guess_format
+
+from ontology import Linkset, rdfSubject
+import rdfio
+
+create = Namespace("https://data.create.humanities.uva.nl/")
+schema = Namespace("http://schema.org/")
+void = Namespace("http://rdfs.org/ns/void#")
+dcterms = Namespace("http://purl.org/dc/terms/")
+
+rdflib.graph.DATASET_DEFAULT_GRAPH_ID = create
+
+BATCHSIZE = 100_000
+
+Target = namedtuple('Target', ['prefix', 'pattern'])
+
+TARGETS = {
+    create.term('id/rijksmuseum/'):
+    Target('http://hdl.handle.net/10934/',
+           re.compile(r'http://hdl\.handle\.net/10934/RM0001\.PEOPLE\.\d+')),
+    create.term('id/ecartico/'):
+    Target(
+        'http://www.vondel.humanities.uva.nl/ecartico/',
+        re.compile(
+            r'http://www\.vondel\.humanities\.uva\.nl/ecartico/persons/\d+')),
+    create.term('id/adamlink/persons/'):
+    Target('https://adamlink.nl/person/',
+           re.compile(r'https://adamlink\.nl/person/[^/]+/\d+')),
+    URIRef("https://wikidata.org/"):
+    Target('http://www.wikidata.org/entity/',
+           re.compile(r'http://www\.wikidata\.org/entity/Q\d+')),
+}
+
+LINE = re.compile(r'<([^>]*)>\s+<([^>]*)>\s+<([^>]*)>\s*(?:<([^>]*)>)?\s*\.')
+
+
+def hashes(uris: Iterable[str]) -> np.ndarray:
+    """64-bit hashes of IRIs, the same in every run (pandas' fixed key)."""
+
+    return pd.util.hash_array(np.asarray(list(uris), dtype=object))
+
+
+def isLineFormat(fp: str) -> bool:
+    return fp.endswith(('.nt', '.nq'))
+
+
+def guessFormat(fp: str) -> str:
+    return guess_format(fp) or 'trig'
+
+
+@contextmanager
+def lineFile(fp: str):
+    """A version of a file that can be read line by line.
+
+    N-Triples and N-Quads files are used as is, other formats are converted
+    to a temporary file that is removed afterwards.
+
+    Yields:
+        str: Path to an N-Triples or N-Quads file.
+    """
+
+    if isLineFormat(fp):
+        yield fp
+        return
+
+    format = guessFormat(fp)
+    if format in rdfio.QUADFORMATS:
+        destination, destinationFormat = 'converted.nq', 'nquads'
+    else:
+        destination, destinationFormat = 'converted.nt', 'nt'
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        destination = os.path.join(tmpdir, destination)
+        rdfio.convert(fp, destination, format, destinationFormat)
+
+        yield destination
+
+
+def iterSubjects(fp: str, graph=None) -> Generator[str, None, None]:
+    """Stream the subject IRIs of a dump.
+
+    Args:
+        fp (str): Path to the dump.
+        graph (URIRef, optional): Only take subjects from this named graph
+            (N-Quads, TriG). All subjects when not given.
+
+    Yields:
+        Generator[str]: Subject IRIs, possibly repeated.
+    """
+
+    with lineFile(fp) as fp, open(fp, encoding='utf-8') as infile:
+        for line in infile:
+            if not line.startswith('<'):
+                continue
+
+            if graph is not None:
+                rest = line.rstrip().rstrip('.').rstrip()
+                start = rest.rfind('<')
+                if (not rest.endswith('>') or rest[start - 2:start] == '^^'
+                        or rest[start + 1:-1] != str(graph)):
+                    continue
+
+            yield line[1:line.index('>')]
+
+
+def buildIndex(fp: str, graph=None, batchsize: int = BATCHSIZE) -> np.ndarray:
+    """Build the membership index of the subjects in a dump.
+
+    Args:
+        fp (str): Path to the dump.
+        graph (URIRef, optional): Only index subjects from this named graph.
+        batchsize (int, optional): Number of subjects hashed at a time.
+
+    Returns:
+        np.ndarray: Sorted, unique 64-bit subject hashes.
+    """
+
+    parts = []
+    batch = []
+
+    for s in iterSubjects(fp, graph=graph):
+        batch.append(s)
+
+        if len(batch) == batchsize:
+            parts.append(np.unique(hashes(batch)))
+            batch = []
+
+    parts.append(np.unique(hashes(batch)))
+
+    return np.unique(np.concatenate(parts))
+
+
+def contains(index: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Vectorized membership test of hashes against a sorted index."""
+
+    if len(index) == 0:
+        return np.zeros(len(values), dtype=bool)
+
+    positions = np.searchsorted(index, values)
+    positions[positions == len(index)] = 0
+
+    return index[positions] == values
+
+
+def iterLinks(fp: str,
+              linkPredicate=OWL.sameAs) -> Generator[tuple, None, None]:
+    """Stream the links from a linkset.
+
+    Args:
+        fp (str): Path to the linkset.
+        linkPredicate (URIRef, optional): Property used to link entities.
+
+    Yields:
+        Generator[tuple]: (subject, object) IRI pairs.
+    """
+
+    predicate = f"<{linkPredicate}>"
+
+    # Splitting on whitespace is twice as fast as matching LINE, and IRIs
+    # cannot contain whitespace.
+    with lineFile(fp) as fp, open(fp, encoding='utf-8') as infile:
+        for line in infile:
+            parts = line.split(None, 3)
+
+            if (len(parts) == 4 and parts[1] == predicate
+                    and parts[0].startswith('<') and parts[2].startswith('<')):
+                yield parts[0][1:-1], parts[2][1:-1]
+
+
+def classify(uris: pd.Series, indices: dict,
+             targets: dict = TARGETS) -> pd.DataFrame:
+    """Find the target each IRI belongs to and decide on its state.
+
+    An IRI belongs to the first target whose prefix it starts with.
+
+    Args:
+        uris (pd.Series): IRIs to classify.
+        indices (dict): Membership index per checked target.
+        targets (dict, optional): Prefix and pattern of every target.
+
+    Returns:
+        pd.DataFrame: `target` (categorical, empty for unknown IRIs) and
+            `issue` columns, with the same index as `uris`.
+    """
+
+    codes = np.zeros(len(uris), dtype=np.int8)  # 0 is unknown
+    issue = np.full(len(uris), 'unknown', dtype=object)
+
+    for code, (target, (prefix, pattern)) in enumerate(targets.items(), 1):
+        rest = np.flatnonzero(codes == 0)
+        positions = rest[uris.iloc[rest].str.startswith(prefix).to_numpy(
+            dtype=bool)]
+        if len(positions) == 0:
+            continue
+
+        codes[positions] = code
+
+        valid = uris.iloc[positions].str.fullmatch(pattern.pattern).to_numpy(
+            dtype=bool)
+        issue[positions[~valid]] = 'broken'
+        positions = positions[valid]
+
+        if target not in indices:
+            issue[positions] = 'unchecked'
+        else:
+            found = contains(indices[target], hashes(uris.iloc[positions]))
+            issue[positions] = np.where(found, 'ok', 'dangling')
+
+    categories = pd.Index([''] + list(targets), dtype=object)
+
+    return pd.DataFrame(
+        {
+            'target': pd.Categorical.from_codes(codes, categories=categories),
+            'issue': issue
+        },
+        index=uris.index)
+
+
+def checkBatch(batch: list, indices: dict, targets: dict, outfile,
+               counts: Counter, resolved: Counter):
+    """Check a batch of links.
+
+    Writes the `dangling`, `broken` and `unknown` link ends to `outfile`.
+    Updates `counts` with the number of link ends per (target, state) and
+    `resolved` with the number of links per pair of targets of which both
+    ends are `ok` or `unchecked`.
+    """
+
+    if not batch:
+        return
+
+    links = pd.DataFrame(batch, columns=['uri1', 'uri2'])
+
+    sides = []
+    for column in ('uri1', 'uri2'):
+        ends = classify(links[column], indices, targets)
+        sides.append(ends)
+
+        counts.update(
+            ends.groupby(['target', 'issue'], observed=True).size().to_dict())
+
+        issues = ends[~ends['issue'].isin(['ok', 'unchecked'])]
+        pd.DataFrame({
+            'uri1': links['uri1'][issues.index],
+            'uri2': links['uri2'][issues.index],
+            'uri': links[column][issues.index],
+            'target': issues['target'],
+            'issue': issues['issue']
+        }).to_csv(outfile, header=False, index=False, lineterminator='\n')
+
+    left, right = sides
+    both = (left['issue'].isin(['ok', 'unchecked'])
+            & right['issue'].isin(['ok', 'unchecked'])).to_numpy()
+    left = left['target'].cat.codes.to_numpy()[both].astype(np.int64)
+    right = right['target'].cat.codes.to_numpy()[both].astype(np.int64)
+
+    # Count every unordered pair of targets at once
+    size = len(targets) + 1
+    pairs, sizes = np.unique(np.minimum(left, right) * size +
+                             np.maximum(left, right),
+                             return_counts=True)
+
+    categories = sides[0]['target'].cat.categories
+    for pair, n in zip(pairs, sizes):
+        first, second = divmod(int(pair), size)
+        resolved[tuple(sorted((categories[first],
+                               categories[second])))] += int(n)
+
+
+def checkLinkset(linkset: str,
+                 dumps: dict,
+                 destination: str,
+                 linkPredicate=OWL.sameAs,
+                 targets: dict = TARGETS,
+                 batchsize: int = BATCHSIZE) -> tuple:
+    """Check a linkset and write its issues to a csv file.
+
+    Args:
+        linkset (str): Path to the linkset.
+        dumps (dict): For every target to check, a (path, graph) tuple. The
+            graph can be `None` to take all subjects in the dump.
+        destination (str): Path of the csv file with the dangling, broken and
+            unknown link ends.
+        linkPredicate (URIRef, optional): Property used to link entities.
+        targets (dict, optional): Prefix and pattern of every target.
+        batchsize (int, optional): Number of links checked at a time.
+
+    Returns:
+        tuple: Number of link ends per target and state (pd.DataFrame),
+            total number of links (int) and number of resolved links per
+            pair of targets (Counter).
+    """
+
+    indices = {}
+    for target, (fp, graph) in dumps.items():
+        print("Indexing", target)
+        indices[target] = buildIndex(fp, graph=graph, batchsize=batchsize)
+
+    counts = Counter()
+    resolved = Counter()
+    links = 0
+
+    with open(destination, 'w', newline='', encoding='utf-8') as outfile:
+        outfile.write('uri1,uri2,uri,target,issue\n')
+
+        batch = []
+        for link in iterLinks(linkset, linkPredicate=linkPredicate):
+            batch.append(link)
+            links += 1
+
+            if len(batch) == batchsize:
+                checkBatch(batch, indices, targets, outfile, counts, resolved)
+                batch = []
+
+        checkBatch(batch, indices, targets, outfile, counts, resolved)
+
+    df = pd.DataFrame([(target, issue, n)
+                       for (target, issue), n in counts.items()],
+                      columns=['target', 'issue', 'count'])
+
+    if not df.empty:
+        df = df.pivot_table(index='target',
+                            columns='issue',
+                            values='count',
+                            aggfunc='sum',
+                            fill_value=0)
+
+    return df, links, resolved
+
+
+def linksetIdentifier(fp: str) -> URIRef:
+    """The IRI of the `void:Linkset` described in a linkset file."""
+
+    found = set()
+    rdftype, linkset = str(RDF.type), str(void.Linkset)
+
+    with lineFile(fp) as fp, open(fp, encoding='utf-8') as infile:
+        for line in infile:
+            m = LINE.match(line)
+            if m and m.group(2) == rdftype and m.group(3) == linkset:
+                found.add(URIRef(m.group(1)))
+
+    if len(found) != 1:
+        raise ValueError(
+            f"Expected one void:Linkset in {fp}, found {len(found)}. "
+            "Pass the identifier explicitly.")
+
+    return found.pop()
+
+
+def statistics(identifier: URIRef, links: int,
+               resolved: Counter) -> rdflib.Graph:
+    """Describe the checked linkset and its verified parts in VoID.
+
+    Every pair of linked datasets becomes a `void:subset` that counts the
+    links (`void:triples`) of which neither end is dangling, broken or
+    unknown. Ends in a dataset without a local dump (e.g. Wikidata) cannot be
+    verified and are accepted if they have the right form.
+    """
+
+    g = rdflib.Graph()
+    rdfSubject.db = g
+
+    DATE = Literal(datetime.datetime.now().strftime('%Y-%m-%d'),
+                   datatype=XSD.datetime)
+
+    ls = Linkset(identifier, dcdate=DATE)
+    ls.triples = Literal(links)
+
+    subsets = []
+    for targets, n in resolved.items():
+        subset = Linkset(None,
+                         target=[URIRef(t) for t in sorted(set(targets))],
+                         triples=Literal(n),
+                         isPartOf=ls)
+        subsets.append(subset)
+
+    ls.subset = subsets
+
+    g.bind('void', void)
+    g.bind('dcterms', dcterms)
+    g.bind('schema', schema)
+
+    return g
+
+
+def main(linkset, dumps, destination, linkPredicate=OWL.sameAs,
+         identifier=None):
+
+    # Converted once, if needed, for both reads
+    with lineFile(linkset) as linkset:
+        identifier = identifier or linksetIdentifier(linkset)
+
+        stats, links, resolved = checkLinkset(
+            linkset,
+            dumps,
+            destination=destination + '.csv',
+            linkPredicate=linkPredicate)
+
+    print(stats)
+    stats.to_csv(destination + '-statistics.csv')
+
+    g = statistics(identifier, links, resolved)
+    rdfio.serialize(g, destination + '-void.ttl', format='turtle')
+
+
+if __name__ == "__main__":
+    main(linkset='datasets/linkset.trig',
+         dumps={
+             create.term('id/rijksmuseum/'):
+             ('datasets/rijksmuseum.trig', create.term('id/rijksmuseum/')),
+             create.term('id/ecartico/'): ('data/ecartico.nt', None),
+             create.term('id/adamlink/persons/'):
+             ('datasets/adamlink.trig', create.term('id/adamlink/persons/')),
+         },
+         linkPredicate=OWL.sameAs,
+         destination='linkcheck')
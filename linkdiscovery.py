@@ -0,0 +1,429 @@
+"""
+Discover `owl:sameAs` links between the persons in ECARTICO, ONSTAGE and
+Adamlink.
+
+Comparing all persons of two datasets is quadratic, so the candidate pairs
+are generated by blocking: two persons are only compared when they share a
+blocking key, made up of a normalized surname token and the decade of birth
+or death. The candidates are scored in parallel with vectorized name (trigram
+Dice) and date similarity. Pairs that score at or above a confidence
+threshold are written to a csv file and turned into a linkset with
+`linkset.buildLinkset()`.
+"""
+
+import re
+import zlib
+import datetime
+import unicodedata
+
+from multiprocessing import Pool
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+import rdflib
+from rdflib import Literal, XSD, Namespace, RDF, RDFS, OWL
+from rdflib.util import guess_format
+
+from ontology import Dataset, Linkset, rdfSubject
+from linkset import buildLinkset
+import rdfio
+
+create = Namespace("https://data.create.humanities.uva.nl/")
+schema = Namespace("http://schema.org/")
+void = Namespace("http://rdfs.org/ns/void#")
+foaf = Namespace("http://xmlns.com/foaf/0.1/")
+dcterms = Namespace("http://purl.org/dc/terms/")
+pnv = Namespace("https://w3id.org/pnv#")
+
+rdflib.graph.DATASET_DEFAULT_GRAPH_ID = create
+rdflib.NORMALIZE_LITERALS = False
+
+# Dutch surname prefixes (tussenvoegsels) are not informative for blocking
+PARTICLES = {
+    'van', 'de', 'der', 'den', 'het', 't', 'ten', 'ter', 'te', 'la', 'le',
+    'du', 'des', 'di', 'da', 'von', 'vander', 'vande', 'op', 'in', 'aan', 'uit'
+}
+
+MAXBLOCK = 1000  # blocks with more persons on one side are skipped
+DATETOLERANCE = 10  # years difference at which the date similarity is 0
+WEIGHTS = {'name': 0.6, 'birth': 0.2, 'death': 0.2}
+THRESHOLD = 0.85
+CHUNKSIZE = 5_000  # candidate pairs scored per task
+
+
+def normalize(name: str) -> str:
+    """Lowercase, strip diacritics and punctuation, and spell ij as y.
+
+    Dutch names are written with both (Heijden, Heyden).
+    """
+
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    name = re.sub(r"[^\w\s]", ' ', name.lower()).replace('ij', 'y')
+
+    return ' '.join(name.split())
+
+
+def surnameTokens(name: str, surname: str = None) -> list:
+    """Blocking tokens of a person's surname.
+
+    Uses the explicit surname if available, otherwise the last word of the
+    full name. Particles are left out.
+    """
+
+    if isinstance(surname, str) and surname:
+        tokens = normalize(surname).split()
+    else:
+        tokens = normalize(name).split()[-1:]
+
+    return [t for t in tokens if t not in PARTICLES and len(t) > 1]
+
+
+def year(date) -> float:
+
+    if date is None:
+        return np.nan
+
+    m = re.match(r'\s*(-?\d{4})', str(date))
+
+    return float(m.group(1)) if m else np.nan
+
+
+def loadPersons(fp: str, graph=None, format: str = None) -> pd.DataFrame:
+    """Read the persons from a dump.
+
+    Args:
+        fp (str): Path to the dump.
+        graph (URIRef, optional): Only take persons from this named graph
+            (TriG, N-Quads). The whole file is read as one graph otherwise.
+        format (str, optional): rdflib format of the dump. Guessed from the
+            file extension when not given.
+
+    Returns:
+        pd.DataFrame: One row per person, with columns `uri`, `name`,
+            `surname`, `birth` and `death` (years).
+    """
+
+    format = format or guess_format(fp)
+
+    if graph is not None:
+        dsG = rdflib.Dataset()
+        rdfio.parse(dsG, fp, format=format)
+        g = dsG.graph(identifier=graph)
+    else:
+        g = rdflib.Graph()
+        rdfio.parse(g, fp, format=format)
+
+    records = []
+    for person in set(g.subjects(RDF.type, schema.Person)):
+
+        name = (g.value(person, schema.name) or g.value(person, foaf.name)
+                or g.value(person, RDFS.label))
+        if name is None:
+            continue
+
+        surname = None
+        for personname in g.objects(person, pnv.hasName):
+            surname = g.value(personname, pnv.baseSurname)
+            if surname:
+                break
+
+        records.append({
+            'uri': str(person),
+            'name': str(name),
+            'surname': str(surname) if surname else None,
+            'birth': year(g.value(person, schema.birthDate)),
+            'death': year(g.value(person, schema.deathDate))
+        })
+
+    return pd.DataFrame(records,
+                        columns=['uri', 'name', 'surname', 'birth', 'death'])
+
+
+def blockingKeys(persons: pd.DataFrame, spread: bool = False) -> pd.DataFrame:
+    """Generate the blocking keys for each person.
+
+    A key is a surname token combined with a birth or death decade. Persons
+    without any date get no keys, as `score()` never accepts them.
+
+    Args:
+        persons (pd.DataFrame): Output of `loadPersons()`.
+        spread (bool, optional): Also emit the neighbouring decades, so that
+            1649 and 1651 still end up in the same block. Only needed on one
+            side of the comparison.
+
+    Returns:
+        pd.DataFrame: `index` (row in persons) and `key` columns.
+    """
+
+    offsets = (-1, 0, 1) if spread else (0, )
+
+    rows = []
+    for i, name, surname, birth, death in zip(persons.index, persons['name'],
+                                              persons['surname'],
+                                              persons['birth'],
+                                              persons['death']):
+        for token in surnameTokens(name, surname):
+            for kind, value in (('b', birth), ('d', death)):
+                if not np.isnan(value):
+                    for offset in offsets:
+                        decade = int(value // 10) + offset
+                        rows.append((i, f"{token}|{kind}{decade}"))
+
+    return pd.DataFrame(rows, columns=['index', 'key'])
+
+
+def candidates(left: pd.DataFrame,
+               right: pd.DataFrame,
+               maxblock: int = MAXBLOCK) -> pd.DataFrame:
+    """Candidate pairs of persons that share at least one blocking key.
+
+    Returns:
+        pd.DataFrame: Unique `left` and `right` row indices.
+    """
+
+    lkeys = blockingKeys(left)
+    rkeys = blockingKeys(right, spread=True)
+
+    # Very common keys (e.g. 'jansz') would reintroduce the quadratic blowup
+    lsize = lkeys.groupby('key')['index'].transform('size')
+    rsize = rkeys.groupby('key')['index'].transform('size')
+    lkeys = lkeys[lsize <= maxblock]
+    rkeys = rkeys[rsize <= maxblock]
+
+    pairs = lkeys.merge(rkeys, on='key', suffixes=('_left', '_right'))
+    pairs = pairs[['index_left', 'index_right']].drop_duplicates()
+    pairs.columns = ['left', 'right']
+
+    return pairs.reset_index(drop=True)
+
+
+def trigrams(names: Iterable[str]) -> np.ndarray:
+    """Hashed, padded trigram sets of names.
+
+    Trigrams are hashed with crc32, which (unlike `hash()`) is the same in
+    every run and process.
+
+    Returns:
+        np.ndarray: (len(names), n) int64 array, padded with -1, where n is
+            the size of the largest trigram set.
+    """
+
+    sets = []
+    for name in names:
+        name = f"  {normalize(name)} ".encode('utf-8')
+        sets.append(
+            sorted({zlib.crc32(name[j:j + 3])
+                    for j in range(len(name) - 2)}))
+
+    n = max((len(s) for s in sets), default=1)
+    grams = np.full((len(sets), n), -1, dtype=np.int64)
+
+    for i, hashed in enumerate(sets):
+        grams[i, :len(hashed)] = hashed
+
+    return grams
+
+
+def nameSimilarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Vectorized Dice coefficient of two aligned arrays of trigram sets."""
+
+    valid_a = a >= 0
+    valid_b = b >= 0
+
+    shared = ((a[:, :, None] == b[:, None, :]) & valid_a[:, :, None]).sum(
+        axis=(1, 2))
+    total = valid_a.sum(axis=1) + valid_b.sum(axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(total > 0, 2 * shared / total, 0.0)
+
+
+def dateSimilarity(a: np.ndarray,
+                   b: np.ndarray,
+                   tolerance: int = DATETOLERANCE) -> np.ndarray:
+    """Linear similarity of two year arrays, NaN where either is unknown."""
+
+    return np.clip(1 - np.abs(a - b) / tolerance, 0, 1)
+
+
+# Per person arrays, handed to every worker process once by `initWorker()`
+_shared = {}
+
+
+def initWorker(lgrams, rgrams, lbirth, rbirth, ldeath, rdeath):
+
+    _shared.update(lgrams=lgrams,
+                   rgrams=rgrams,
+                   lbirth=lbirth,
+                   rbirth=rbirth,
+                   ldeath=ldeath,
+                   rdeath=rdeath)
+
+
+def score(chunk: tuple) -> np.ndarray:
+    """Score a chunk of candidate pairs. Runs in a worker process.
+
+    The score is the weighted mean of the name, birth and death similarity,
+    leaving out the dates that are unknown for either person. A name alone
+    is not enough (think of all the Pieter Jansz's), so pairs without any
+    date known for both persons score 0.
+
+    Args:
+        chunk (tuple): Arrays with the left and right row indices of the
+            pairs.
+    """
+
+    li, ri = chunk
+
+    sims = np.vstack([
+        nameSimilarity(_shared['lgrams'][li], _shared['rgrams'][ri]),
+        dateSimilarity(_shared['lbirth'][li], _shared['rbirth'][ri]),
+        dateSimilarity(_shared['ldeath'][li], _shared['rdeath'][ri])
+    ])
+    weights = np.array([WEIGHTS['name'], WEIGHTS['birth'],
+                        WEIGHTS['death']])[:, None] * ~np.isnan(sims)
+
+    dated = weights[1:].sum(axis=0) > 0
+
+    return np.where(
+        dated, (np.nan_to_num(sims) * weights).sum(axis=0) /
+        weights.sum(axis=0), 0.0)
+
+
+def discoverLinks(left: pd.DataFrame,
+                  right: pd.DataFrame,
+                  threshold: float = THRESHOLD,
+                  processes: int = None,
+                  chunksize: int = CHUNKSIZE,
+                  maxblock: int = MAXBLOCK) -> pd.DataFrame:
+    """Find the persons in `left` and `right` that are likely the same.
+
+    Args:
+        left (pd.DataFrame): Persons, output of `loadPersons()`.
+        right (pd.DataFrame): Persons, output of `loadPersons()`.
+        threshold (float, optional): Minimal score of an accepted pair.
+        processes (int, optional): Number of worker processes. Defaults to
+            the number of cores.
+        chunksize (int, optional): Number of pairs scored per task.
+        maxblock (int, optional): Skip blocking keys shared by more persons.
+
+    Returns:
+        pd.DataFrame: Accepted pairs with columns `uri1`, `uri2` and `score`.
+    """
+
+    left = left.reset_index(drop=True)
+    right = right.reset_index(drop=True)
+
+    pairs = candidates(left, right, maxblock=maxblock)
+    print(f"{len(pairs)} candidate pairs "
+          f"(of {len(left) * len(right)} possible)")
+
+    shared = (trigrams(left['name']), trigrams(right['name']),
+              left['birth'].values, right['birth'].values,
+              left['death'].values, right['death'].values)
+
+    lindex = pairs['left'].values
+    rindex = pairs['right'].values
+
+    # Only the row indices of a chunk travel to the workers
+    starts = range(0, len(pairs), chunksize)
+    chunks = ((lindex[start:start + chunksize], rindex[start:start + chunksize])
+              for start in starts)
+
+    accepted = []
+    with Pool(processes, initializer=initWorker, initargs=shared) as pool:
+        for start, scores in zip(starts, pool.imap(score, chunks)):
+            keep = np.flatnonzero(scores >= threshold)
+            accepted.append((keep + start, scores[keep]))
+
+    positions = np.concatenate([p for p, _ in accepted] or [[]]).astype(int)
+    scores = np.concatenate([s for _, s in accepted] or [[]])
+
+    return pd.DataFrame({
+        'uri1': left['uri'].values[lindex[positions]],
+        'uri2': right['uri'].values[rindex[positions]],
+        'score': scores
+    })
+
+
+def main(sources, destination, threshold=THRESHOLD, linkPredicate=OWL.sameAs):
+
+    persons = {}
+    for name, (fp, graph) in sources.items():
+        print("Loading persons from", fp)
+        persons[name] = loadPersons(fp, graph=graph)
+
+    dsG = rdflib.Dataset()
+
+    DATE = Literal(datetime.datetime.now().strftime('%Y-%m-%d'),
+                   datatype=XSD.datetime)
+
+    linksets = []
+    names = list(sources)
+    for n, name1 in enumerate(names):
+        for name2 in names[n + 1:]:
+            print(f"Discovering links between {name1} and {name2}")
+            links = discoverLinks(persons[name1],
+                                  persons[name2],
+                                  threshold=threshold)
+
+            csvfile = f"data/linkset-{name1}-{name2}.csv"
+            links.to_csv(csvfile, index=False)
+
+            identifier = create.term(f'id/linkset/{name1}-{name2}/')
+            g = buildLinkset(csvfile=csvfile,
+                             linkPredicate=linkPredicate,
+                             identifier=identifier)
+            dsG.add_graph(g)
+
+            rdfSubject.db = dsG
+            ds = Linkset(
+                identifier,
+                name=[
+                    Literal(f"{name1.upper()} - {name2.upper()} person linkset",
+                            lang='en')
+                ],
+                description=[
+                    Literal(
+                        f"Automatically discovered links between persons in {name1.upper()} and {name2.upper()}, based on name and date similarity. Only pairs with a score of at least {threshold} are included.",
+                        lang='en')
+                ],
+                dateModified=DATE,
+                dcdate=DATE,
+                dcmodified=DATE,
+                target=[sources[name1][1], sources[name2][1]],
+                linkPredicate=[linkPredicate])
+            ds.triples = len(g)
+            linksets.append(ds)
+
+    rdfSubject.db = dsG
+    linksetDs = Dataset(
+        create.term('id/linkset/'),
+        name=[Literal("Linkset collection", lang='en')],
+        description=["Collection of linksets stored in this triplestore."])
+
+    linksetDs.subset = linksets
+    linksetDs.hasPart = linksets
+    for ds in linksets:
+        ds.isPartOf = linksetDs
+        ds.inDataset = linksetDs
+
+    dsG.bind('owl', OWL)
+    dsG.bind('void', void)
+    dsG.bind('dcterms', dcterms)
+    dsG.bind('schema', schema)
+    rdfio.serialize(dsG, destination, format='trig')
+
+
+if __name__ == "__main__":
+    main(sources={
+        'ecartico': ('datasets/ecartico.trig', create.term('id/ecartico/')),
+        'onstage': ('datasets/onstage.trig', create.term('id/onstage/')),
+        'adamlink': ('datasets/adamlink.trig',
+                     create.term('id/adamlink/persons/'))
+    },
+         destination="datasets/linkset-persons.trig",
+         threshold=THRESHOLD)
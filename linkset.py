@@ -8,6 +8,7 @@ import rdflib
 from rdflib import Dataset, ConjunctiveGraph, Graph, URIRef, Literal, XSD, Namespace, RDFS, BNode, OWL
 
 from ontology import Dataset, DataDownload, Linkset, rdfSubject
+import rdfio
 
 create = Namespace("https://data.create.humanities.uva.nl/")
 schema = Namespace("http://schema.org/")
@@ -80,7 +81,7 @@ def main(csvfile, linkPredicate, destination):
     dsG.bind('void', void)
     dsG.bind('dcterms', dcterms)
     dsG.bind('schema', schema)
-    dsG.serialize(destination=destination, format='trig')
+    rdfio.serialize(dsG, destination, format='trig')
 
 
 if __name__ == "__main__":
@@ -10,6 +10,7 @@ import rdflib
 from rdflib import Dataset, ConjunctiveGraph, Graph, URIRef, Literal, XSD, Namespace, RDFS, BNode, OWL
 
 from ontology import Dataset, DataDownload, Linkset, rdfSubject
+import rdfio
 
 create = Namespace("https://data.create.humanities.uva.nl/")
 schema = Namespace("http://schema.org/")
@@ -86,7 +87,7 @@ Go see your favorite play!""",
     g.bind('skos', Namespace('http://www.w3.org/2004/02/skos/core#'))
     g.bind('time', Namespace('http://www.w3.org/2006/time#'))
 
-    g.parse(fp, format='nt')
+    rdfio.parse(g, fp, format='nt')
 
     dsG.add_graph(g)
 
@@ -97,7 +98,7 @@ Go see your favorite play!""",
     dsG.bind('schema', schema)
 
     print("Serializing!")
-    dsG.serialize('datasets/onstage.trig', format='trig')
+    rdfio.serialize(dsG, 'datasets/onstage.trig', format='trig')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,361 @@
+# pip install aiohttp
+"""
+Publish the named graphs of a `datasets/*.trig` file to a triplestore that
+implements the SPARQL 1.1 Graph Store HTTP Protocol (e.g. Fuseki's `/data`
+service).
+
+Every named graph is cut into size-bounded N-Triples chunks that are sent
+concurrently over a pooled connection. Chunks are serialized as they are
+sent, so at most `concurrency` of them are held in memory at a time. For an
+atomic replace, point `updateEndpoint` to the SPARQL Update service of the
+same store: the chunks are then loaded into a staging graph which is swapped
+in with a single `MOVE` once all chunks have arrived, or dropped if one of
+them fails. Without an update endpoint, the graph is replaced in place
+(`PUT` of the first chunk, `POST` of the rest).
+
+The default graph holds the metadata of all datasets in the store, so it is
+never replaced: its triples are merged in with `POST` only.
+
+Blank nodes are scoped to a single request in the Graph Store Protocol, so
+they are skolemized (replaced by `/.well-known/genid/` IRIs) while the graph
+is cut into chunks.
+"""
+
+import asyncio
+import random
+
+from typing import Generator
+
+import aiohttp
+
+import rdflib
+from rdflib import URIRef, BNode, Namespace
+
+import rdfio
+
+create = Namespace("https://data.create.humanities.uva.nl/")
+
+rdflib.graph.DATASET_DEFAULT_GRAPH_ID = create
+rdflib.NORMALIZE_LITERALS = False
+
+NTRIPLES = 'application/n-triples'
+SPARQLUPDATE = 'application/sparql-update'
+
+CHUNKSIZE = 8 * 1024 * 1024  # bytes
+CONCURRENCY = 4
+RETRIES = 5
+BACKOFF = 1.0  # seconds, doubled on every retry
+
+
+class PublishError(Exception):
+    """Raised when the store keeps refusing a request."""
+
+
+def skolemize(term):
+
+    if isinstance(term, BNode):
+        return term.skolemize(authority=str(create))
+    else:
+        return term
+
+
+def chunkGraph(g: rdflib.Graph,
+               chunksize: int = CHUNKSIZE) -> Generator[bytes, None, None]:
+    """Serialize a graph to N-Triples in chunks of at most `chunksize` bytes.
+
+    All triples of a single subject end up in the same chunk, so a chunk can
+    only exceed `chunksize` if one subject is larger than that by itself.
+    Blank nodes are skolemized.
+
+    Args:
+        g (rdflib.Graph): The graph to serialize.
+        chunksize (int, optional): Maximum size of a chunk in bytes.
+
+    Yields:
+        Generator[bytes]: N-Triples documents, UTF-8 encoded.
+    """
+
+    chunk = []
+    size = 0
+
+    for s in set(g.subjects()):
+        rows = [
+            rdfio.ntRow(*map(skolemize, t)).encode('utf-8')
+            for t in g.triples((s, None, None))
+        ]
+        rowsize = sum(len(r) for r in rows)
+
+        if chunk and size + rowsize > chunksize:
+            yield b''.join(chunk)
+            chunk = []
+            size = 0
+
+        chunk += rows
+        size += rowsize
+
+    if chunk:
+        yield b''.join(chunk)
+
+
+def isDefaultGraph(identifier) -> bool:
+
+    # DATASET_DEFAULT_GRAPH_ID is a Namespace, which never equals a URIRef
+    return str(identifier) == str(rdflib.graph.DATASET_DEFAULT_GRAPH_ID)
+
+
+def graphParams(identifier) -> dict:
+    """Query parameters that address a graph in the Graph Store Protocol."""
+
+    if isDefaultGraph(identifier):
+        return {'default': ''}
+    else:
+        return {'graph': str(identifier)}
+
+
+async def request(session: aiohttp.ClientSession,
+                  semaphore: asyncio.Semaphore,
+                  method: str,
+                  url: str,
+                  data: bytes,
+                  contentType: str,
+                  params: dict = None,
+                  retries: int = RETRIES,
+                  backoff: float = BACKOFF):
+    """Send a single request, retrying with exponential backoff.
+
+    Connection errors, timeouts, 429 and 5xx responses are retried. Any other
+    4xx response is considered final.
+
+    Args:
+        session (aiohttp.ClientSession): Session holding the connection pool.
+        semaphore (asyncio.Semaphore): Bounds the number of requests in flight.
+        method (str): HTTP method (`PUT` or `POST`).
+        url (str): Endpoint url.
+        data (bytes): Request body.
+        contentType (str): MIME type of the body.
+        params (dict, optional): Query parameters.
+        retries (int, optional): Number of retries before giving up.
+        backoff (float, optional): Initial delay between retries in seconds.
+
+    Raises:
+        PublishError: If the request did not succeed after all retries.
+    """
+
+    headers = {'Content-Type': contentType}
+
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                async with session.request(method,
+                                           url,
+                                           params=params,
+                                           data=data,
+                                           headers=headers) as response:
+                    body = await response.text()
+
+                    if response.status < 300:
+                        return
+                    elif response.status != 429 and response.status < 500:
+                        raise PublishError(
+                            f"{method} {response.url} failed with {response.status}: {body}"
+                        )
+
+                    reason = f"{response.status}: {body}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            reason = repr(e)
+
+        if attempt < retries:
+            delay = backoff * 2**attempt
+            await asyncio.sleep(delay + random.uniform(0, delay / 2))
+
+    raise PublishError(
+        f"{method} {url} {params} failed after {retries + 1} attempts ({reason})"
+    )
+
+
+async def publishGraph(session: aiohttp.ClientSession,
+                       semaphore: asyncio.Semaphore,
+                       endpoint: str,
+                       g: rdflib.Graph,
+                       updateEndpoint: str = None,
+                       chunksize: int = CHUNKSIZE,
+                       concurrency: int = CONCURRENCY,
+                       retries: int = RETRIES,
+                       backoff: float = BACKOFF) -> int:
+    """Replace a graph in the store with the contents of `g`.
+
+    The default graph is the exception: `g` is merged into it.
+
+    Args:
+        session (aiohttp.ClientSession): Session holding the connection pool.
+        semaphore (asyncio.Semaphore): Bounds the number of requests in flight.
+        endpoint (str): Graph Store Protocol endpoint.
+        g (rdflib.Graph): Graph to publish, its identifier is the target graph.
+        updateEndpoint (str, optional): SPARQL Update endpoint. If given, the
+            graph is loaded into a staging graph and moved in place at once.
+        chunksize (int, optional): Maximum size of a request body in bytes.
+        concurrency (int, optional): Maximum number of chunks in flight.
+        retries (int, optional): Number of retries per request.
+        backoff (float, optional): Initial delay between retries in seconds.
+
+    Returns:
+        int: Number of chunks sent.
+
+    Raises:
+        PublishError: If a chunk could not be sent. The requests still in
+            flight are cancelled and the staging graph is dropped.
+    """
+
+    merge = isDefaultGraph(g.identifier)
+    staging = updateEndpoint and not merge
+
+    if staging:
+        target = URIRef(str(g.identifier) + '_staging')
+    else:
+        target = g.identifier
+
+    params = graphParams(target)
+    kwargs = dict(params=params, retries=retries, backoff=backoff)
+
+    chunks = chunkGraph(g, chunksize=chunksize)
+
+    sent = 0
+    pending = set()
+    try:
+        # The first chunk replaces whatever was in the (staging) graph, the
+        # others are appended to it and can go in parallel.
+        if not merge:
+            await request(session, semaphore, 'PUT', endpoint,
+                          next(chunks, b''), NTRIPLES, **kwargs)
+            sent += 1
+
+        # The next chunk is only serialized when there is room in the window
+        for chunk in chunks:
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+
+            pending.add(
+                asyncio.ensure_future(
+                    request(session, semaphore, 'POST', endpoint, chunk,
+                            NTRIPLES, **kwargs)))
+            sent += 1
+
+        await asyncio.gather(*pending)
+
+        if staging:
+            query = f"MOVE GRAPH <{target}> TO GRAPH <{g.identifier}>"
+            await request(session,
+                          semaphore,
+                          'POST',
+                          updateEndpoint,
+                          query.encode('utf-8'),
+                          SPARQLUPDATE,
+                          retries=retries,
+                          backoff=backoff)
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        if staging:
+            await dropGraph(session, semaphore, updateEndpoint, target,
+                            retries, backoff)
+        raise
+
+    return sent
+
+
+async def dropGraph(session: aiohttp.ClientSession,
+                    semaphore: asyncio.Semaphore, updateEndpoint: str,
+                    identifier: URIRef, retries: int, backoff: float):
+    """Drop a (staging) graph after a failed upload, on a best effort basis.
+    """
+
+    query = f"DROP SILENT GRAPH <{identifier}>"
+
+    try:
+        await request(session,
+                      semaphore,
+                      'POST',
+                      updateEndpoint,
+                      query.encode('utf-8'),
+                      SPARQLUPDATE,
+                      retries=retries,
+                      backoff=backoff)
+    except PublishError as e:
+        print(f"Could not drop {identifier}: {e}")
+
+
+async def publish(endpoint: str,
+                  source: str,
+                  updateEndpoint: str = None,
+                  graphs: list = None,
+                  chunksize: int = CHUNKSIZE,
+                  concurrency: int = CONCURRENCY,
+                  retries: int = RETRIES,
+                  backoff: float = BACKOFF,
+                  timeout: float = 300):
+    """Publish the graphs in a TriG file to a Graph Store Protocol endpoint.
+
+    Args:
+        endpoint (str): Graph Store Protocol endpoint.
+        source (str): TriG file to publish.
+        updateEndpoint (str, optional): SPARQL Update endpoint, enables the
+            atomic replace through a staging graph.
+        graphs (list, optional): Only publish these graph identifiers. All
+            graphs in the file by default.
+        chunksize (int, optional): Maximum size of a request body in bytes.
+        concurrency (int, optional): Maximum number of requests in flight.
+        retries (int, optional): Number of retries per request.
+        backoff (float, optional): Initial delay between retries in seconds.
+        timeout (float, optional): Timeout of a single request in seconds.
+    """
+
+    dsG = rdflib.Dataset()
+    rdfio.parse(dsG, source, format='trig')
+
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+
+        # The default graph can be listed more than once
+        contexts = {str(g.identifier): g for g in dsG.contexts()}
+
+        for g in contexts.values():
+            if graphs is not None and g.identifier not in graphs:
+                continue
+            if len(g) == 0:
+                continue
+
+            print("Publishing", g.identifier)
+            n = await publishGraph(session,
+                                   semaphore,
+                                   endpoint,
+                                   g,
+                                   updateEndpoint=updateEndpoint,
+                                   chunksize=chunksize,
+                                   concurrency=concurrency,
+                                   retries=retries,
+                                   backoff=backoff)
+            print(f"Sent {len(g)} triples in {n} chunk(s)")
+
+
+def main(endpoint, source, updateEndpoint=None, **kwargs):
+
+    asyncio.run(
+        publish(endpoint=endpoint,
+                source=source,
+                updateEndpoint=updateEndpoint,
+                **kwargs))
+
+
+if __name__ == "__main__":
+    main(endpoint='http://localhost:3030/create/data',
+         updateEndpoint='http://localhost:3030/create/update',
+         source='datasets/linkset.trig')
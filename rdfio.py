@@ -0,0 +1,744 @@
+"""
+Parse and serialize engines for the build scripts.
+
+All scripts read their input and write their `datasets/*.trig` output through
+`parse()` and `serialize()`, which dispatch to one of these engines:
+
+    * `rdflib`: rdflib's own parsers and serializers, all formats
+    * `lines`: a line based N-Triples/N-Quads reader and writer
+    * `oxigraph`: the native parsers and serializers of pyoxigraph, if
+      installed (`pip install pyoxigraph`)
+
+Unless an engine is asked for explicitly, the fastest available engine for a
+format is picked by a small benchmark, separately for parsing and
+serializing. The choice is cached on disk per host and library versions.
+Run this file to check that all engines produce the same quads for the files
+in `datasets/` and to see the benchmark results; `test_rdfio.py` runs the
+same checks.
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import time
+import platform
+import tempfile
+
+from typing import Generator
+
+import rdflib
+from rdflib import URIRef, Literal, BNode, Namespace, RDF, XSD
+from rdflib.compare import to_isomorphic
+from rdflib.plugins.serializers import nquads
+
+try:
+    import pyoxigraph
+except ImportError:
+    pyoxigraph = None
+
+create = Namespace("https://data.create.humanities.uva.nl/")
+
+rdflib.graph.DATASET_DEFAULT_GRAPH_ID = create
+
+BATCHSIZE = 10_000
+BENCHMARKSIZE = 4_000  # triples in the generated benchmark sample
+QUADFORMATS = ('nquads', 'trig')
+
+# Fastest engine per format and operation, as measured on this host
+CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'create-datasets',
+                     'rdfio.json')
+
+
+class Engine:
+    """Base class of a parse/serialize engine.
+
+    Subclasses indicate the formats (rdflib format names) they support and
+    implement `parse` and `serialize`.
+    """
+
+    name = None
+    formats = ()
+
+    def available(self) -> bool:
+        return True
+
+    def parse(self, target: rdflib.Graph, source: str, format: str):
+        """Add the triples/quads in `source` to `target` (a Graph or Dataset).
+        """
+        raise NotImplementedError
+
+    def serialize(self, graph: rdflib.Graph, destination: str, format: str):
+        raise NotImplementedError
+
+
+def addQuads(target: rdflib.Graph, quads: Generator[tuple, None, None]):
+    """Add quads to a graph in batches.
+
+    If `target` is a Dataset (or ConjunctiveGraph), every quad ends up in its
+    own named graph, with `None` meaning the default graph. A plain Graph
+    receives all triples.
+    """
+
+    if isinstance(target, rdflib.ConjunctiveGraph):
+        contexts = {None: target.default_graph}
+
+        def context(g):
+            if g not in contexts:
+                contexts[g] = target.get_context(g)
+            return contexts[g]
+    else:
+
+        def context(g):
+            return target
+
+    batch = []
+    for s, p, o, g in quads:
+        batch.append((s, p, o, context(g)))
+
+        if len(batch) == BATCHSIZE:
+            target.addN(batch)
+            batch = []
+
+    target.addN(batch)
+
+
+def iterQuads(graph: rdflib.Graph) -> Generator[tuple, None, None]:
+    """All quads in a graph, with `None` for the default graph."""
+
+    if isinstance(graph, rdflib.ConjunctiveGraph):
+        for s, p, o, g in graph.quads((None, None, None, None)):
+            g = getattr(g, 'identifier', g)
+
+            # DATASET_DEFAULT_GRAPH_ID is a Namespace, which never equals a
+            # URIRef
+            if str(g) == str(rdflib.graph.DATASET_DEFAULT_GRAPH_ID):
+                g = None
+
+            yield s, p, o, g
+    else:
+        for s, p, o in graph:
+            yield s, p, o, None
+
+
+##########
+# rdflib #
+##########
+
+
+class RdflibEngine(Engine):
+
+    name = 'rdflib'
+    formats = ('nt', 'nquads', 'turtle', 'trig', 'xml')
+
+    def parse(self, target, source, format):
+
+        if isinstance(target, rdflib.ConjunctiveGraph):
+            # Otherwise rdflib puts the default graph triples in a graph
+            # named after the file.
+            target.parse(source,
+                         format=format,
+                         publicID=rdflib.graph.DATASET_DEFAULT_GRAPH_ID)
+        else:
+            target.parse(source, format=format)
+
+    def serialize(self, graph, destination, format):
+
+        if format == 'nquads':
+            # The N-Quads serializer holds its own reference to the default
+            # graph name, and only leaves out a graph name equal to it.
+            nquads.DATASET_DEFAULT_GRAPH_ID = URIRef(
+                str(rdflib.graph.DATASET_DEFAULT_GRAPH_ID))
+
+        graph.serialize(destination=destination,
+                        format=format,
+                        encoding='utf-8')
+
+
+#########
+# lines #
+#########
+
+IRI = r'<([^>]*)>'
+BNODE = r'_:([^\s.]+(?:\.[^\s.]+)*)'
+LITERAL = r'"((?:[^"\\]|\\.)*)"(?:@([a-zA-Z]+(?:-[a-zA-Z0-9]+)*)|\^\^<([^>]*)>)?'
+
+LINE = re.compile(rf'\s*(?:{IRI}|{BNODE})\s*{IRI}\s*(?:{IRI}|{BNODE}|{LITERAL})'
+                  rf'\s*(?:{IRI}|{BNODE})?\s*\.\s*(?:#.*)?$')
+
+ESCAPE = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))')
+ESCAPES = {
+    't': '\t',
+    'b': '\b',
+    'n': '\n',
+    'r': '\r',
+    'f': '\f',
+    '"': '"',
+    "'": "'",
+    '\\': '\\'
+}
+
+
+def unescape(value: str) -> str:
+
+    if '\\' not in value:
+        return value
+
+    def replace(m):
+        if m.group(3) is not None:
+            return ESCAPES[m.group(3)]
+        return chr(int(m.group(1) or m.group(2), 16))
+
+    return ESCAPE.sub(replace, value)
+
+
+def quoteLiteral(value: str) -> str:
+
+    return (value.replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n').replace('\r', '\\r'))
+
+
+def ntTerm(term) -> str:
+    """The N-Triples representation of a term."""
+
+    if isinstance(term, URIRef):
+        return f"<{term}>"
+    elif isinstance(term, BNode):
+        return f"_:{term}"
+    elif term.language:
+        return f'"{quoteLiteral(term)}"@{term.language}'
+    elif term.datatype:
+        return f'"{quoteLiteral(term)}"^^<{term.datatype}>'
+    else:
+        return f'"{quoteLiteral(term)}"'
+
+
+def ntRow(s, p, o, g=None) -> str:
+    """A single N-Triples (or, with `g`, N-Quads) line."""
+
+    if g is None:
+        return f"{ntTerm(s)} {ntTerm(p)} {ntTerm(o)} .\n"
+    else:
+        return f"{ntTerm(s)} {ntTerm(p)} {ntTerm(o)} {ntTerm(g)} .\n"
+
+
+class LineEngine(Engine):
+    """Line based N-Triples/N-Quads reader and writer.
+
+    Only one regular expression match per line, and no grammar machinery,
+    which makes it several times faster than rdflib's parser.
+    """
+
+    name = 'lines'
+    formats = ('nt', 'nquads')
+
+    def quads(self, source: str) -> Generator[tuple, None, None]:
+
+        bnodes = {}
+        iris = {}  # predicates and graph names repeat a lot
+
+        def iri(value):
+            if value not in iris:
+                iris[value] = URIRef(unescape(value))
+            return iris[value]
+
+        def bnode(label):
+            if label not in bnodes:
+                bnodes[label] = BNode()
+            return bnodes[label]
+
+        with open(source, encoding='utf-8') as infile:
+            for n, line in enumerate(infile, 1):
+                m = LINE.match(line)
+
+                if m is None:
+                    if not line.strip() or line.lstrip().startswith('#'):
+                        continue
+                    raise ValueError(f"Invalid line {n} in {source}: {line}")
+
+                (siri, sbnode, p, oiri, obnode, value, lang, datatype, giri,
+                 gbnode) = m.groups()
+
+                s = URIRef(unescape(siri)) if siri is not None else bnode(
+                    sbnode)
+
+                if oiri is not None:
+                    o = URIRef(unescape(oiri))
+                elif obnode is not None:
+                    o = bnode(obnode)
+                else:
+                    o = Literal(unescape(value),
+                                lang=lang,
+                                datatype=URIRef(datatype) if datatype else None)
+
+                if giri is not None:
+                    g = iri(giri)
+                elif gbnode is not None:
+                    g = bnode(gbnode)
+                else:
+                    g = None
+
+                yield s, iri(p), o, g
+
+    def parse(self, target, source, format):
+        addQuads(target, self.quads(source))
+
+    def serialize(self, graph, destination, format):
+
+        quads = format == 'nquads'
+
+        with open(destination, 'w', encoding='utf-8') as outfile:
+            outfile.writelines(
+                ntRow(s, p, o, g if quads else None)
+                for s, p, o, g in iterQuads(graph))
+
+
+############
+# oxigraph #
+############
+
+if pyoxigraph is not None:
+    OXFORMATS = {
+        'nt': pyoxigraph.RdfFormat.N_TRIPLES,
+        'nquads': pyoxigraph.RdfFormat.N_QUADS,
+        'turtle': pyoxigraph.RdfFormat.TURTLE,
+        'trig': pyoxigraph.RdfFormat.TRIG,
+        'xml': pyoxigraph.RdfFormat.RDF_XML
+    }
+
+
+class OxigraphEngine(Engine):
+    """The native (Rust) parsers and serializers of pyoxigraph."""
+
+    name = 'oxigraph'
+    formats = ('nt', 'nquads', 'turtle', 'trig', 'xml')
+
+    def available(self):
+        return pyoxigraph is not None
+
+    @staticmethod
+    def toRdflib(term, bnodes: dict):
+        """The rdflib version of an oxigraph term.
+
+        Blank node labels are only unique within a file, so every parse
+        passes its own `bnodes` map from label to a fresh BNode.
+        """
+
+        if isinstance(term, pyoxigraph.NamedNode):
+            return URIRef(term.value)
+        elif isinstance(term, pyoxigraph.BlankNode):
+            if term.value not in bnodes:
+                bnodes[term.value] = BNode()
+            return bnodes[term.value]
+        elif isinstance(term, pyoxigraph.Literal):
+            if term.language:
+                return Literal(term.value, lang=term.language)
+            elif term.datatype.value == str(XSD.string):
+                return Literal(term.value)
+            else:
+                return Literal(term.value,
+                               datatype=URIRef(term.datatype.value))
+        else:
+            return None  # the default graph
+
+    @staticmethod
+    def toOxigraph(term):
+
+        if term is None:
+            return pyoxigraph.DefaultGraph()
+        elif isinstance(term, URIRef):
+            return pyoxigraph.NamedNode(str(term))
+        elif isinstance(term, BNode):
+            return pyoxigraph.BlankNode(str(term))
+        elif term.language:
+            return pyoxigraph.Literal(str(term), language=term.language)
+        elif term.datatype:
+            return pyoxigraph.Literal(str(term),
+                                      datatype=pyoxigraph.NamedNode(
+                                          str(term.datatype)))
+        else:
+            return pyoxigraph.Literal(str(term))
+
+    def parse(self, target, source, format):
+
+        toRdflib = self.toRdflib
+        bnodes = {}
+
+        def quads():
+            for q in pyoxigraph.parse(path=source, format=OXFORMATS[format]):
+                yield (toRdflib(q.subject, bnodes),
+                       toRdflib(q.predicate, bnodes),
+                       toRdflib(q.object, bnodes),
+                       toRdflib(getattr(q, 'graph_name', None), bnodes))
+
+        addQuads(target, quads())
+
+    def serialize(self, graph, destination, format):
+
+        toOxigraph = self.toOxigraph
+
+        if format in ('nquads', 'trig'):
+            quads = iterQuads(graph)
+            if format == 'trig':
+                # One block per graph instead of one per quad
+                quads = sorted(quads, key=lambda q: str(q[3] or ''))
+
+            items = (pyoxigraph.Quad(toOxigraph(s), toOxigraph(p),
+                                     toOxigraph(o), toOxigraph(g))
+                     for s, p, o, g in quads)
+        else:
+            items = (pyoxigraph.Triple(toOxigraph(s), toOxigraph(p),
+                                       toOxigraph(o))
+                     for s, p, o, _ in iterQuads(graph))
+
+        if format in ('turtle', 'trig'):
+            # Only the bound prefixes that are used by a predicate or class,
+            # rdflib binds many more by default.
+            used = set()
+            for _, p, o, _ in iterQuads(graph):
+                used.add(p)
+                if p == RDF.type:
+                    used.add(o)
+
+            prefixes = {
+                p: str(ns)
+                for p, ns in graph.namespaces()
+                if p and any(str(t).startswith(str(ns)) for t in used)
+            }
+            pyoxigraph.serialize(items,
+                                 destination,
+                                 format=OXFORMATS[format],
+                                 prefixes=prefixes)
+        else:
+            pyoxigraph.serialize(items, destination, format=OXFORMATS[format])
+
+
+ENGINES = {
+    engine.name: engine
+    for engine in (RdflibEngine(), LineEngine(), OxigraphEngine())
+}
+
+# Engine per (format, operation), filled from the cache or by `benchmark()`
+DEFAULTS = {}
+
+
+def availableEngines(format: str) -> list:
+
+    return [
+        engine for engine in ENGINES.values()
+        if engine.available() and format in engine.formats
+    ]
+
+
+def sampleGraph(format: str, size: int = BENCHMARKSIZE) -> rdflib.Graph:
+    """A graph with a mix of terms like in the build output.
+
+    For formats with named graphs, a Dataset with the data in a named graph.
+    """
+
+    if format in QUADFORMATS:
+        dsG = rdflib.Dataset()
+        g = dsG.graph(identifier=create.term('id/benchmark/'))
+    else:
+        dsG = g = rdflib.Graph()
+
+    for n in range(size // 4):
+        person = URIRef(f"http://example.org/person/{n}")
+        name = BNode()
+
+        g.add((person, URIRef("http://schema.org/name"),
+               Literal(f"Persoon \"{n}\"\nvan Amsterdam", lang='nl')))
+        g.add((person, URIRef("http://schema.org/birthDate"),
+               Literal(f"{1600 + n % 200}-01-01", datatype=XSD.date)))
+        g.add((person, URIRef("https://w3id.org/pnv#hasName"), name))
+        g.add((name, URIRef("https://w3id.org/pnv#baseSurname"),
+               Literal(f"Jansz{n}")))
+
+    return dsG
+
+
+def benchmark(format: str, sample: str = None, repeat: int = 3) -> dict:
+    """Time parsing and serializing with every engine for a format.
+
+    Args:
+        format (str): rdflib format name.
+        sample (str, optional): File to parse. A generated sample when not
+            given.
+        repeat (int, optional): Best of this many runs is taken.
+
+    Returns:
+        dict: Seconds per engine name, per operation ('parse', 'serialize').
+    """
+
+    def graph():
+        return rdflib.Dataset() if format in QUADFORMATS else rdflib.Graph()
+
+    def best(f):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            f()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+
+        if sample is None:
+            sample = os.path.join(tmpdir, 'sample')
+            ENGINES['rdflib'].serialize(sampleGraph(format), sample, format)
+
+        destination = os.path.join(tmpdir, 'output')
+
+        data = graph()
+        ENGINES['rdflib'].parse(data, sample, format)
+
+        timings = {'parse': {}, 'serialize': {}}
+        for engine in availableEngines(format):
+            timings['parse'][engine.name] = best(
+                lambda: engine.parse(graph(), sample, format))
+            timings['serialize'][engine.name] = best(
+                lambda: engine.serialize(data, destination, format))
+
+    return timings
+
+
+def versions() -> dict:
+    """Versions that invalidate the cached benchmark results."""
+
+    return {
+        'python': platform.python_version(),
+        'rdflib': rdflib.__version__,
+        'pyoxigraph': getattr(pyoxigraph, '__version__', None),
+        'engines': sorted(e.name for e in ENGINES.values() if e.available())
+    }
+
+
+def loadCache(fp: str = None) -> dict:
+
+    fp = fp or CACHE
+
+    try:
+        with open(fp) as infile:
+            cache = json.load(infile)
+    except (OSError, ValueError):
+        return {}
+
+    if cache.get('versions') != versions():
+        return {}
+
+    return cache.get('engines', {})
+
+
+def saveCache(engines: dict, fp: str = None):
+
+    fp = fp or CACHE
+
+    try:
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+        with open(fp, 'w') as outfile:
+            json.dump({'versions': versions(), 'engines': engines}, outfile)
+    except OSError:
+        pass  # a read-only home only costs a benchmark next time
+
+
+def getEngine(format: str,
+              engine: str = None,
+              operation: str = 'parse') -> Engine:
+    """The engine to use for a format.
+
+    The choice is cached on disk (see `CACHE`), so the benchmark only runs
+    once per host and set of library versions.
+
+    Args:
+        format (str): rdflib format name.
+        engine (str, optional): Name of the engine. The fastest available
+            one (by `benchmark()`) when not given.
+        operation (str, optional): 'parse' or 'serialize'.
+    """
+
+    if engine is not None:
+        return ENGINES[engine]
+
+    key = f"{format}:{operation}"
+
+    if key not in DEFAULTS:
+        candidates = availableEngines(format)
+
+        if len(candidates) == 1:
+            DEFAULTS[key] = candidates[0]
+        else:
+            cached = loadCache()
+
+            if cached.get(key) not in [e.name for e in candidates]:
+                timings = benchmark(format)
+                for op, results in timings.items():
+                    cached[f"{format}:{op}"] = min(results, key=results.get)
+                saveCache(cached)
+
+            DEFAULTS[key] = ENGINES[cached[key]]
+
+    return DEFAULTS[key]
+
+
+def parse(target: rdflib.Graph, source: str, format: str, engine: str = None):
+    """Parse a file into a Graph or Dataset.
+
+    Args:
+        target (rdflib.Graph): Graph or Dataset to add the data to.
+        source (str): Path to the file.
+        format (str): rdflib format name (e.g. 'nt', 'turtle', 'trig').
+        engine (str, optional): Name of the engine to use.
+    """
+
+    getEngine(format, engine, 'parse').parse(target, source, format)
+
+
+def serialize(graph: rdflib.Graph,
+              destination: str,
+              format: str,
+              engine: str = None):
+    """Serialize a Graph or Dataset to a file.
+
+    Args:
+        graph (rdflib.Graph): Graph or Dataset to serialize.
+        destination (str): Path to the file.
+        format (str): rdflib format name (e.g. 'nt', 'turtle', 'trig').
+        engine (str, optional): Name of the engine to use.
+    """
+
+    getEngine(format, engine, 'serialize').serialize(graph, destination,
+                                                     format)
+
+
+def convert(source: str, destination: str, format: str,
+            destinationFormat: str):
+    """Convert a file to another format.
+
+    With pyoxigraph the quads are streamed from parser to serializer, so a
+    dump of any size can be turned into N-Quads (and then be read line by
+    line). Otherwise the file is loaded in a Dataset once.
+
+    Args:
+        source (str): Path to the file.
+        destination (str): Path to the converted file.
+        format (str): rdflib format name of the source.
+        destinationFormat (str): rdflib format name of the destination.
+    """
+
+    if pyoxigraph is not None:
+        pyoxigraph.serialize(pyoxigraph.parse(path=source,
+                                              format=OXFORMATS[format]),
+                             destination,
+                             format=OXFORMATS[destinationFormat])
+    else:
+        dsG = rdflib.Dataset()
+        parse(dsG, source, format)
+        serialize(dsG, destination, destinationFormat)
+
+
+def canonical(graph: rdflib.Graph) -> dict:
+    """Canonical form of every graph in a Dataset, to compare engines."""
+
+    quads = {}
+    for s, p, o, g in iterQuads(graph):
+        quads.setdefault(g, rdflib.Graph()).add((s, p, o))
+
+    return {g: to_isomorphic(triples) for g, triples in quads.items()}
+
+
+def canonicalFile(source: str, format: str) -> dict:
+    """Canonical form of a file as written, read with rdflib.
+
+    The build scripts name the default graph after the `create` namespace,
+    which makes it indistinguishable from a named graph with that IRI once
+    parsed. For the duration of this read, the default graph gets a name of
+    its own, so that a writer that moves the default graph is caught.
+    """
+
+    default = rdflib.graph.DATASET_DEFAULT_GRAPH_ID
+    rdflib.graph.DATASET_DEFAULT_GRAPH_ID = URIRef('urn:x-rdfio:default')
+
+    try:
+        dsG = rdflib.Dataset()
+        ENGINES['rdflib'].parse(dsG, source, format)
+        return canonical(dsG)
+    finally:
+        rdflib.graph.DATASET_DEFAULT_GRAPH_ID = default
+
+
+def conformance(source: str, format: str = 'trig') -> list:
+    """Check that all engines produce the same quads.
+
+    The file is read with every engine that supports its format. Then every
+    engine writes the data as N-Quads and in the file's own format, and every
+    N-Quads reader reads those N-Quads back. All must give the same graphs,
+    with the default graph kept apart from the named graphs.
+
+    Returns:
+        list: Descriptions of the failing engines, empty if all conform.
+    """
+
+    failures = []
+
+    reference = rdflib.Dataset()
+    ENGINES['rdflib'].parse(reference, source, format)
+    expected = canonical(reference)
+    written = canonicalFile(source, format)
+
+    for engine in availableEngines(format):
+        dsG = rdflib.Dataset()
+        engine.parse(dsG, source, format)
+
+        if canonical(dsG) != expected:
+            failures.append(f"{engine.name} parse of {source}")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for writer in availableEngines(format):
+            fp = os.path.join(tmpdir, f"{writer.name}.{format}")
+            writer.serialize(reference, fp, format)
+
+            if canonicalFile(fp, format) != written:
+                failures.append(f"{writer.name} {format} write of {source}")
+
+        for writer in availableEngines('nquads'):
+            fp = os.path.join(tmpdir, f"{writer.name}.nq")
+            writer.serialize(reference, fp, 'nquads')
+
+            if canonicalFile(fp, 'nquads') != written:
+                failures.append(f"{writer.name} nquads write of {source}")
+
+            for reader in availableEngines('nquads'):
+                dsG = rdflib.Dataset()
+                reader.parse(dsG, fp, 'nquads')
+
+                if canonical(dsG) != expected:
+                    failures.append(
+                        f"{writer.name} -> {reader.name} nquads round trip of {source}"
+                    )
+
+    return failures
+
+
+def main(pattern='datasets/*.trig'):
+
+    failures = []
+    for fp in sorted(glob.glob(pattern)):
+        print("Checking", fp)
+        failures += conformance(fp)
+
+    for failure in failures:
+        print("FAILED:", failure)
+
+    for format in ('nt', 'nquads', 'turtle', 'trig'):
+        for operation, timings in benchmark(format).items():
+            fastest = min(timings, key=timings.get)
+            print(format, operation,
+                  {k: round(v, 3) for k, v in timings.items()}, "->",
+                  fastest)
+
+    return not failures
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
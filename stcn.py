@@ -10,6 +10,7 @@ import rdflib
 from rdflib import Dataset, ConjunctiveGraph, Graph, URIRef, Literal, XSD, Namespace, RDFS, BNode, OWL
 
 from ontology import Dataset, DataDownload, Linkset, rdfSubject
+import rdfio
 
 create = Namespace("https://data.create.humanities.uva.nl/")
 schema = Namespace("http://schema.org/")
@@ -99,7 +100,7 @@ De STCN wordt samengesteld en uitgegeven door de Koninklijke Bibliotheek.""",
     ]
     for n, f in enumerate(turtlefiles, 1):
         print(f"Parsing {n}/{len(turtlefiles)}\t {f}")
-        g.parse(f, format='turtle')
+        rdfio.parse(g, f, format='turtle')
 
     dsG.add_graph(g)
 
@@ -110,7 +111,7 @@ De STCN wordt samengesteld en uitgegeven door de Koninklijke Bibliotheek.""",
     dsG.bind('schema', schema)
 
     print("Serializing!")
-    dsG.serialize('datasets/stcn.trig', format='trig')
+    rdfio.serialize(dsG, 'datasets/stcn.trig', format='trig')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,139 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+from rdflib import URIRef
+
+pytest.importorskip('rdfalchemy')  # through ontology
+
+import linkcheck
+from linkcheck import create
+
+RIJKSMUSEUM = create.term('id/rijksmuseum/')
+ECARTICO = create.term('id/ecartico/')
+WIKIDATA = URIRef("https://wikidata.org/")
+
+RM = 'http://hdl.handle.net/10934/RM0001.PEOPLE.'
+EC = 'http://www.vondel.humanities.uva.nl/ecartico/persons/'
+WD = 'http://www.wikidata.org/entity/Q'
+
+
+@pytest.fixture
+def indices():
+    return {
+        RIJKSMUSEUM: linkcheck.hashes([RM + '1', RM + '2']),
+        ECARTICO: np.unique(linkcheck.hashes([EC + '1']))
+    }
+
+
+def test_contains_empty_index():
+    values = linkcheck.hashes(['a', 'b'])
+    empty = np.array([], dtype=np.uint64)
+
+    assert list(linkcheck.contains(empty, values)) == [False, False]
+
+
+def test_contains_edges():
+    index = np.array([10, 20, 30], dtype=np.uint64)
+    values = np.array([0, 10, 25, 30, 40], dtype=np.uint64)
+
+    assert list(linkcheck.contains(index, values)) == [
+        False, True, False, True, False
+    ]
+
+
+def test_classify(indices):
+    uris = pd.Series([
+        RM + '1', RM + '3', 'http://hdl.handle.net/10934/other', WD + '42',
+        'http://example.org/1', EC + '1'
+    ])
+
+    result = linkcheck.classify(uris, {RIJKSMUSEUM: indices[RIJKSMUSEUM]})
+
+    assert list(result['issue']) == [
+        'ok', 'dangling', 'broken', 'unchecked', 'unknown', 'unchecked'
+    ]
+    assert list(result['target']) == [
+        RIJKSMUSEUM, RIJKSMUSEUM, RIJKSMUSEUM, WIKIDATA, '', ECARTICO
+    ]
+
+
+def test_subjects_from_graph(tmp_path):
+    fp = tmp_path / 'dump.nq'
+    fp.write_text(
+        f'<{RM}1> <http://schema.org/name> "One" <{RIJKSMUSEUM}> .\n'
+        f'<{RM}2> <http://schema.org/name> "Two" <{ECARTICO}> .\n'
+        f'<{RM}3> <http://schema.org/name> "Three" .\n'
+        f'<{RM}4> <http://schema.org/birthDate> "1650"^^<{RIJKSMUSEUM}> .\n'
+        f'_:b0 <http://schema.org/name> "Five" <{RIJKSMUSEUM}> .\n')
+
+    assert list(linkcheck.iterSubjects(str(fp), graph=RIJKSMUSEUM)) == [
+        RM + '1'
+    ]
+    assert list(linkcheck.iterSubjects(str(fp))) == [
+        RM + '1', RM + '2', RM + '3', RM + '4'
+    ]
+
+
+def test_subjects_from_trig(tmp_path):
+    fp = tmp_path / 'dump.trig'
+    fp.write_text(f"""
+        <{RM}1> <http://schema.org/name> "Default" .
+        <{RIJKSMUSEUM}> {{ <{RM}2> <http://schema.org/name> "Two" . }}
+    """)
+
+    assert list(linkcheck.iterSubjects(str(fp), graph=RIJKSMUSEUM)) == [
+        RM + '2'
+    ]
+
+
+def test_resolved_pairs(tmp_path, indices):
+    links = [
+        (RM + '1', EC + '1'),  # ok, ok
+        (EC + '1', RM + '2'),  # same pair, other direction
+        (RM + '1', WD + '1'),  # ok, unchecked
+        (RM + '3', WD + '1'),  # dangling
+        (RM + '1', 'http://example.org/1'),  # unknown
+    ]
+    counts = Counter()
+    resolved = Counter()
+
+    with open(tmp_path / 'issues.csv', 'w') as outfile:
+        linkcheck.checkBatch(links, indices, linkcheck.TARGETS, outfile,
+                             counts, resolved)
+
+    assert resolved == {
+        tuple(sorted((RIJKSMUSEUM, ECARTICO))): 2,
+        tuple(sorted((RIJKSMUSEUM, WIKIDATA))): 1
+    }
+    assert counts[(WIKIDATA, 'unchecked')] == 2
+    assert counts[(RIJKSMUSEUM, 'dangling')] == 1
+
+    # Only the issues are written
+    issues = pd.read_csv(tmp_path / 'issues.csv', header=None)
+    assert sorted(issues[4]) == ['dangling', 'unknown']
+
+
+def test_check_linkset(tmp_path, indices):
+    linkset = tmp_path / 'linkset.trig'
+    linkset.write_text(f"""
+        <{create}linkset/test/> a <http://rdfs.org/ns/void#Linkset> .
+        <{create}linkset/test/> {{
+            <{RM}1> <http://www.w3.org/2002/07/owl#sameAs> <{WD}1> .
+            <{RM}3> <http://www.w3.org/2002/07/owl#sameAs> <{WD}2> .
+        }}
+    """)
+    dump = tmp_path / 'rijksmuseum.nt'
+    dump.write_text(f'<{RM}1> <http://schema.org/name> "One" .\n')
+
+    df, links, resolved = linkcheck.checkLinkset(
+        str(linkset), {RIJKSMUSEUM: (str(dump), None)},
+        str(tmp_path / 'issues.csv'),
+        batchsize=1)
+
+    assert links == 2
+    assert resolved == {tuple(sorted((RIJKSMUSEUM, WIKIDATA))): 1}
+    assert df.loc[RIJKSMUSEUM, 'dangling'] == 1
+    assert linkcheck.linksetIdentifier(str(linkset)) == create.term(
+        'linkset/test/')
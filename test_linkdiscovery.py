@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('rdfalchemy')  # through ontology
+
+import linkdiscovery
+
+
+def persons(*rows):
+    return pd.DataFrame(
+        [(f"http://example.org/{i}", ) + row for i, row in enumerate(rows)],
+        columns=['uri', 'name', 'surname', 'birth', 'death'])
+
+
+def test_normalize():
+    assert linkdiscovery.normalize("Pieter  van der Heijden!") == (
+        "pieter van der heyden")
+    assert linkdiscovery.normalize("Rembrandt Harmensz. van Rĳn") == (
+        "rembrandt harmensz van ryn")
+
+
+def test_blocking_keys():
+    df = persons(("Pieter van der Heijden", None, 1651.0, np.nan),
+                 ("Jan Jansz", "Jansz", 1600.0, 1670.0),
+                 ("Pieter Jansz", None, np.nan, np.nan))
+
+    keys = linkdiscovery.blockingKeys(df)
+    assert sorted(map(tuple, keys.values)) == [(0, 'heyden|b165'),
+                                               (1, 'jansz|b160'),
+                                               (1, 'jansz|d167')]
+
+    keys = linkdiscovery.blockingKeys(df, spread=True)
+    assert sorted(keys[keys['index'] == 0]['key']) == [
+        'heyden|b164', 'heyden|b165', 'heyden|b166'
+    ]
+    assert len(keys) == 9
+
+
+def test_candidates_maxblock():
+    left = persons(*[(f"Jan Jansz {i}", "Jansz", 1600.0, np.nan)
+                     for i in range(3)])
+    right = persons(("Jan Jansz", "Jansz", 1601.0, np.nan))
+
+    assert len(linkdiscovery.candidates(left, right, maxblock=3)) == 3
+    assert len(linkdiscovery.candidates(left, right, maxblock=2)) == 0
+
+
+def test_name_similarity():
+    names = ["Pieter Jansz", "Pieter Janszoon", "Heijden", "Heyden", "Ab",
+             "Jan van Goyen"]
+
+    def grams(name):
+        name = f"  {linkdiscovery.normalize(name)} "
+        return {name[i:i + 3] for i in range(len(name) - 2)}
+
+    grams_ = linkdiscovery.trigrams(names)
+    for i, a in enumerate(names):
+        for j, b in enumerate(names):
+            dice = 2 * len(grams(a) & grams(b)) / (len(grams(a)) +
+                                                   len(grams(b)))
+            result = linkdiscovery.nameSimilarity(grams_[[i]], grams_[[j]])
+
+            assert result[0] == pytest.approx(dice)
+
+
+def test_score_weights():
+    grams = linkdiscovery.trigrams(["Pieter Jansz"] * 4)
+    birth = np.array([1650.0, 1655.0, np.nan, np.nan])
+    death = np.array([np.nan, 1700.0, 1700.0, np.nan])
+    linkdiscovery.initWorker(grams, grams, birth, birth + 5, death, death)
+
+    scores = linkdiscovery.score((np.arange(4), np.arange(4)))
+
+    weights = linkdiscovery.WEIGHTS
+    assert scores == pytest.approx([
+        # birth 5 years apart, unknown death left out
+        (weights['name'] + 0.5 * weights['birth']) /
+        (weights['name'] + weights['birth']),
+        (weights['name'] + 0.5 * weights['birth'] + weights['death']),
+        1.0,
+        # the same name, but no dates
+        0.0
+    ])
+
+
+def test_discover_links():
+    left = persons(("Pieter van der Heijden", None, 1651.0, np.nan),
+                   ("Pieter Jansz", None, np.nan, np.nan),
+                   ("Jan Jansz", "Jansz", 1600.0, 1670.0),
+                   ("Jan Jansz", "Jansz", 1700.0, np.nan))
+    right = persons(("Pieter van der Heyden", None, 1649.0, np.nan),
+                    ("Pieter Jansz", None, np.nan, np.nan),
+                    ("Jan Jansz", "Jansz", 1601.0, 1670.0),
+                    ("Hendrick Goltzius", None, 1600.0, 1670.0))
+
+    links = linkdiscovery.discoverLinks(left, right, processes=1, chunksize=1)
+
+    assert sorted(zip(links['uri1'], links['uri2'])) == [
+        ('http://example.org/0', 'http://example.org/0'),
+        ('http://example.org/2', 'http://example.org/2'),
+    ]
+    assert (links['score'] >= linkdiscovery.THRESHOLD).all()
@@ -0,0 +1,277 @@
+import asyncio
+
+import aiohttp
+import pytest
+import rdflib
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from rdflib import URIRef, Literal, BNode
+
+import publish
+from publish import create
+
+
+class Store:
+    """Stand-in Graph Store Protocol endpoint that records every request.
+
+    `failures` is a list of status codes returned (in order) before the store
+    starts answering normally, `None` answers a request normally. Every
+    request takes `delay` seconds, so that requests overlap.
+    """
+
+    def __init__(self, failures=(), delay=0):
+        self.failures = list(failures)
+        self.delay = delay
+        self.requests = []
+        self.graphs = {}
+        self.inflight = 0
+        self.maxInflight = 0
+
+        self.app = web.Application()
+        self.app.router.add_route('*', '/data', self.data)
+        self.app.router.add_post('/update', self.update)
+
+    async def data(self, request):
+        body = await request.read()
+
+        self.inflight += 1
+        self.maxInflight = max(self.maxInflight, self.inflight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.inflight -= 1
+
+        self.requests.append((request.method, dict(request.query), body))
+
+        if self.failures:
+            status = self.failures.pop(0)
+            if status is not None:
+                return web.Response(status=status)
+
+        key = request.query.get('graph', 'default')
+        g = rdflib.Graph()
+        g.parse(data=body.decode('utf-8'), format='nt')
+
+        if request.method == 'PUT':
+            self.graphs[key] = g
+        else:
+            self.graphs.setdefault(key, rdflib.Graph())
+            self.graphs[key] += g
+
+        return web.Response(status=204)
+
+    async def update(self, request):
+        body = (await request.read()).decode('utf-8')
+        self.requests.append(('UPDATE', {}, body))
+
+        if body.startswith('DROP SILENT GRAPH '):
+            self.graphs.pop(body.split()[-1].strip('<>'), None)
+        else:
+            source, target = (i.strip('<>') for i in body.replace(
+                'MOVE GRAPH ', '').split(' TO GRAPH '))
+            self.graphs[target] = self.graphs.pop(source)
+
+        return web.Response(status=204)
+
+
+def run(store, coro):
+
+    async def main():
+        async with TestServer(store.app) as server:
+            semaphore = asyncio.Semaphore(publish.CONCURRENCY)
+            async with aiohttp.ClientSession() as session:
+                return await coro(session, semaphore,
+                                  str(server.make_url('/data')),
+                                  str(server.make_url('/update')))
+
+    return asyncio.run(main())
+
+
+def graph(n=100, identifier=create.term('id/test/')):
+
+    g = rdflib.Graph(identifier=identifier)
+    for i in range(n):
+        g.add((URIRef(f"http://example.org/{i}"),
+               URIRef("http://schema.org/name"), Literal(f"Name {i}")))
+
+    return g
+
+
+def test_chunks_are_bounded():
+    g = graph(1000)
+
+    chunks = list(publish.chunkGraph(g, chunksize=2000))
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 2000 for chunk in chunks)
+    assert sum(chunk.count(b'\n') for chunk in chunks) == len(g)
+
+
+def test_put_then_post():
+    store = Store()
+    g = graph(1000)
+
+    n = run(store,
+            lambda session, semaphore, data, update: publish.publishGraph(
+                session, semaphore, data, g, chunksize=2000, backoff=0))
+
+    methods = [method for method, _, _ in store.requests]
+    assert methods[0] == 'PUT'
+    assert set(methods[1:]) == {'POST'}
+    assert len(methods) == n
+    assert all(params == {'graph': str(g.identifier)}
+               for _, params, _ in store.requests)
+    assert len(store.graphs[str(g.identifier)]) == len(g)
+
+
+@pytest.mark.parametrize('status', [429, 500, 503])
+def test_retry(status):
+    store = Store(failures=[status, status])
+
+    run(store,
+        lambda session, semaphore, data, update: publish.publishGraph(
+            session, semaphore, data, graph(), backoff=0))
+
+    assert len(store.requests) == 3
+    assert len(store.graphs[str(create.term('id/test/'))]) == 100
+
+
+def test_retry_gives_up():
+    store = Store(failures=[503] * 3)
+
+    with pytest.raises(publish.PublishError):
+        run(store,
+            lambda session, semaphore, data, update: publish.publishGraph(
+                session, semaphore, data, graph(), retries=2, backoff=0))
+
+    assert len(store.requests) == 3
+
+
+@pytest.mark.parametrize('status', [400, 404, 415])
+def test_no_retry_on_client_error(status):
+    store = Store(failures=[status])
+
+    with pytest.raises(publish.PublishError):
+        run(store,
+            lambda session, semaphore, data, update: publish.publishGraph(
+                session, semaphore, data, graph(), backoff=0))
+
+    assert len(store.requests) == 1
+
+
+def test_staging_swap():
+    store = Store()
+    g = graph(1000)
+    store.graphs[str(g.identifier)] = graph(5)
+
+    run(store,
+        lambda session, semaphore, data, update: publish.publishGraph(
+            session, semaphore, data, g, updateEndpoint=update,
+            chunksize=2000, backoff=0))
+
+    staging = str(g.identifier) + '_staging'
+    assert all(params == {'graph': staging}
+               for method, params, _ in store.requests[:-1])
+    assert store.requests[-1] == (
+        'UPDATE', {}, f"MOVE GRAPH <{staging}> TO GRAPH <{g.identifier}>")
+    assert staging not in store.graphs
+    assert len(store.graphs[str(g.identifier)]) == len(g)
+
+
+def test_concurrency_is_bounded(monkeypatch):
+    store = Store(delay=0.01)
+    g = graph(1000)
+
+    # Count the chunks serialized ahead of the store
+    chunkGraph = publish.chunkGraph
+    ahead = []
+
+    def chunks(*args, **kwargs):
+        for chunk in chunkGraph(*args, **kwargs):
+            ahead.append(len(ahead) + 1 - len(store.requests))
+            yield chunk
+
+    monkeypatch.setattr(publish, 'chunkGraph', chunks)
+
+    n = run(store,
+            lambda session, semaphore, data, update: publish.publishGraph(
+                session, semaphore, data, g, chunksize=1000, backoff=0))
+
+    assert n > 4 * publish.CONCURRENCY
+    assert store.maxInflight == publish.CONCURRENCY
+    assert max(ahead) <= publish.CONCURRENCY + 1
+
+
+def test_failure_drops_staging_graph():
+    store = Store(failures=[None, None, 400], delay=0.01)
+    g = graph(1000)
+    store.graphs[str(g.identifier)] = graph(5)
+
+    with pytest.raises(publish.PublishError):
+        run(store,
+            lambda session, semaphore, data, update: publish.publishGraph(
+                session, semaphore, data, g, updateEndpoint=update,
+                chunksize=1000, backoff=0))
+
+    staging = str(g.identifier) + '_staging'
+    assert store.requests[-1] == ('UPDATE', {},
+                                  f"DROP SILENT GRAPH <{staging}>")
+    assert staging not in store.graphs
+    assert len(store.graphs[str(g.identifier)]) == 5
+
+    # The remaining chunks were cancelled instead of sent
+    assert len(store.requests) < len(list(publish.chunkGraph(g, 1000)))
+
+
+def test_default_graph_is_merged():
+    store = Store()
+    g = graph(10, identifier=URIRef(str(create)))
+
+    run(store,
+        lambda session, semaphore, data, update: publish.publishGraph(
+            session, semaphore, data, g, updateEndpoint=update, backoff=0))
+
+    assert [(method, params) for method, params, _ in store.requests
+            ] == [('POST', {'default': ''})]
+
+
+def test_blank_nodes_are_skolemized():
+    store = Store()
+    g = graph(0)
+    name = BNode()
+    g.add((URIRef("http://example.org/1"), URIRef("https://w3id.org/pnv#hasName"),
+           name))
+    g.add((name, URIRef("https://w3id.org/pnv#baseSurname"), Literal("Jansz")))
+
+    run(store,
+        lambda session, semaphore, data, update: publish.publishGraph(
+            session, semaphore, data, g, chunksize=1, backoff=0))
+
+    assert all(b'_:' not in body for _, _, body in store.requests)
+    stored = store.graphs[str(g.identifier)]
+    assert len(stored) == 2
+    assert len(set(stored.objects()) & set(stored.subjects())) == 1
+
+
+def test_publish_file(tmp_path):
+    store = Store()
+    source = tmp_path / 'test.trig'
+    source.write_text("""
+        <http://example.org/ds> <http://schema.org/name> "Test" .
+        <https://data.create.humanities.uva.nl/id/test/> {
+            <http://example.org/1> <http://schema.org/name> "One" .
+        }
+    """)
+
+    async def main(session, semaphore, data, update):
+        # publish() creates its own session
+        await publish.publish(data, str(source), updateEndpoint=update,
+                              backoff=0)
+
+    run(store, main)
+
+    targets = [params for method, params, _ in store.requests
+               if method in ('PUT', 'POST')]
+    assert targets.count({'default': ''}) == 1
+    assert len(store.graphs['default']) == 1
+    assert len(store.graphs[str(create.term('id/test/'))]) == 1
@@ -0,0 +1,118 @@
+import glob
+
+import pytest
+import rdflib
+from rdflib import URIRef, Literal, BNode
+
+import rdfio
+from rdfio import create
+
+DATASETS = sorted(glob.glob('datasets/*.trig'))
+
+
+@pytest.mark.parametrize('source', DATASETS)
+def test_conformance(source):
+    assert rdfio.conformance(source) == []
+
+
+@pytest.mark.parametrize('engine', [
+    e.name for e in rdfio.availableEngines('nquads')
+])
+def test_nquads_keeps_default_graph(tmp_path, engine):
+    dsG = rdflib.Dataset()
+    rdfio.parse(dsG, 'datasets/linkset.trig', 'trig', engine='rdflib')
+    fp = tmp_path / 'linkset.nq'
+
+    rdfio.serialize(dsG, str(fp), 'nquads', engine=engine)
+
+    # rdflib writes the default graph twice, which is harmless in N-Quads
+    quads = set(rdfio.ENGINES['lines'].quads(str(fp)))
+    assert URIRef(str(create)) not in {g for _, _, _, g in quads}
+    assert len([q for q in quads if q[3] is None]) == len(dsG.default_graph)
+
+
+@pytest.mark.parametrize('format', ['nt', 'nquads'])
+def test_line_engine_round_trip(tmp_path, format):
+    g = rdflib.Dataset() if format == 'nquads' else rdflib.Graph()
+    name = BNode()
+    g.add((URIRef("http://example.org/é"), URIRef("http://schema.org/name"),
+           Literal('tab\there \\ "quoted"\r\nünïcode', lang='nl')))
+    g.add((URIRef("http://example.org/1"), URIRef("https://w3id.org/pnv#hasName"),
+           name))
+    g.add((name, URIRef("https://w3id.org/pnv#baseSurname"), Literal("Jansz")))
+    fp = str(tmp_path / 'data')
+
+    for writer in ('rdflib', 'lines'):
+        rdfio.serialize(g, fp, format, engine=writer)
+
+        for reader in ('rdflib', 'lines'):
+            result = rdflib.Dataset() if format == 'nquads' else rdflib.Graph()
+            rdfio.parse(result, fp, format, engine=reader)
+
+            assert rdfio.canonical(result) == rdfio.canonical(g)
+
+
+@pytest.mark.parametrize('format, engine', [
+    (format, e.name) for format in ('nt', 'turtle')
+    for e in rdfio.availableEngines(format)
+])
+def test_blank_nodes_are_kept_apart_between_files(tmp_path, format, engine):
+    # Both files use the same blank node label for a different name
+    for i in (1, 2):
+        (tmp_path / f"{i}.{format}").write_text(
+            f'<http://example.org/{i}> <https://w3id.org/pnv#hasName> _:b0 .\n'
+            f'_:b0 <https://w3id.org/pnv#baseSurname> "Name {i}" .\n')
+
+    g = rdflib.Graph()
+    for i in (1, 2):
+        rdfio.parse(g, str(tmp_path / f"{i}.{format}"), format, engine=engine)
+
+    assert len(set(g.subjects(URIRef("https://w3id.org/pnv#baseSurname")))) == 2
+
+
+@pytest.fixture
+def benchmarks(tmp_path, monkeypatch):
+    """Count benchmark runs, with lines fastest to parse and rdflib to write.
+    """
+
+    calls = []
+
+    def benchmark(format):
+        calls.append(format)
+        return {
+            'parse': {'rdflib': 2.0, 'lines': 1.0},
+            'serialize': {'rdflib': 1.0, 'lines': 2.0}
+        }
+
+    monkeypatch.setattr(rdfio, 'CACHE', str(tmp_path / 'cache.json'))
+    monkeypatch.setattr(rdfio, 'DEFAULTS', {})
+    monkeypatch.setattr(rdfio, 'benchmark', benchmark)
+    monkeypatch.setattr(rdfio, 'pyoxigraph', None)
+
+    return calls
+
+
+def test_engine_per_operation(benchmarks):
+    assert rdfio.getEngine('nt', operation='parse').name == 'lines'
+    assert rdfio.getEngine('nt', operation='serialize').name == 'rdflib'
+    assert benchmarks == ['nt']
+
+
+def test_engine_choice_is_cached(benchmarks, monkeypatch):
+    rdfio.getEngine('nt')
+
+    # A new process starts with empty DEFAULTS
+    monkeypatch.setattr(rdfio, 'DEFAULTS', {})
+    assert rdfio.getEngine('nt').name == 'lines'
+    assert benchmarks == ['nt']
+
+    # New library versions invalidate the cache
+    monkeypatch.setattr(rdfio, 'DEFAULTS', {})
+    monkeypatch.setattr(rdflib, '__version__', '0.0.0')
+    rdfio.getEngine('nt')
+    assert benchmarks == ['nt', 'nt']
+
+
+def test_single_engine_is_not_benchmarked(benchmarks):
+    assert rdfio.getEngine('trig').name == 'rdflib'
+    assert benchmarks == []